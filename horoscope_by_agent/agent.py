@@ -4,19 +4,30 @@
 
 from openai import OpenAI
 import json
+import os
+import sys
 import tools
-from logger import log_action
+from logger import log_action, TOOL_LOG, RESET
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from horoscope_common.answer_cache import AnswerCache
+from horoscope_common.conversation import ConversationState
 
 class HoroscopeAgent:
     """占い機能を提供するエージェントクラス"""
     DEFAULT_BASE_URL = "http://localhost:1234/v1"
     DEFAULT_API_KEY = "not-needed"
     DEFAULT_MODEL = "openai/gpt-oss-20b"
+    DEFAULT_CACHE_THRESHOLD = AnswerCache.DEFAULT_THRESHOLD
 
-    def __init__(self):
+    def __init__(self, answer_cache=None, cache_threshold=DEFAULT_CACHE_THRESHOLD):
         self.client = OpenAI(base_url=self.DEFAULT_BASE_URL, api_key=self.DEFAULT_API_KEY)
         self.user_input = None
         self.messages = []
+        # 類似質問の回答キャッシュ（複数エージェントで共有する場合は外から渡す）と、
+        # 会話中に判明したユーザー自身のサイン（キャッシュのスコープとツール選択に使用）
+        self.answer_cache = answer_cache if answer_cache is not None else AnswerCache(threshold=cache_threshold)
+        self.state = ConversationState()
 
     def _load_instructions(self, filepath="instruction.txt"):
         """指示文をファイルから読み込む"""
@@ -27,13 +38,21 @@ class HoroscopeAgent:
         except Exception as e:
             print("指示文の読み込みエラー:", e)
 
+    def _select_tools(self):
+        """会話の文脈から今回のLLM呼び出しで送るツールを選ぶ"""
+        selection = tools.registry.select(self.state.tool_context())
+        if selection.saved_tokens:
+            print(f"{TOOL_LOG}[LOG] ツール選択: {', '.join(selection.names)}"
+                  f"（約{selection.saved_tokens}トークン削減、累計{tools.registry.saved_tokens}）{RESET}")
+        return selection.schemas
+
     @log_action
     def _call_llm(self, messages):
         """LLMを呼び出す共通処理"""
         try:
             response = self.client.chat.completions.create(
                 model=self.DEFAULT_MODEL,
-                tools=tools.tools,
+                tools=self._select_tools(),
                 messages=messages,
                 )
             return response
@@ -46,16 +65,14 @@ class HoroscopeAgent:
         """ツールを呼び出す共通処理"""
         tool_name = tool_call.function.name
         arguments = json.loads(tool_call.function.arguments or "{}")
-        if hasattr(tools, tool_name):
-            try:
-                func = getattr(tools, tool_name)
-                result = func(**arguments)
-                return result
-            except Exception as e:
-                print(f"ツール呼び出しエラー ({tool_name}):", e)
-                return None
-        else:
-            raise ValueError(f"Function {tool_name} not found in tools module")
+        func = tools.registry.get(tool_name).func
+        try:
+            result = func(**arguments)
+            self.state.observe_tool_result(tool_name, result)
+            return result
+        except Exception as e:
+            print(f"ツール呼び出しエラー ({tool_name}):", e)
+            return None
 
     @log_action
     def run(self, user_input):
@@ -73,6 +90,14 @@ class HoroscopeAgent:
         # messagesをworking（run実行中に用いる会話履歴）にコピーして、ユーザーメッセージを追加
         working = self.messages.copy()
         working.append({"role": "user", "content": user_input})
+        self.state.start_turn(user_input)
+
+        # 類似の質問に回答済みであれば、LLMを呼び出さずにキャッシュの回答を返す
+        cached = self.state.lookup_answer(self.answer_cache)
+        if cached is not None:
+            working.append({"role": "assistant", "content": cached})
+            self.messages = working
+            return cached
 
         # LLMの応答をもとにアクションを決める
         # ツールの呼び出しがあれば実行して結果を返す、ツールの呼び出しがなければループを終了して応答を返す
@@ -106,6 +131,7 @@ class HoroscopeAgent:
 
         # 今回のrun実行による会話履歴（working）を保存
         self.messages = working
+        self.state.store_answer(self.answer_cache, msg.content)
 
         # 最終応答メッセージを返却
         return msg.content
@@ -1,79 +1,46 @@
 # ===========================
 # tools
 # ===========================
+import os
+import sys
 
-# モデル用の呼び出し可能なツールのリストを定義
-tools = [
-    {
-        "type": "function",
-        "function": {
-            "name": "get_horoscope",
-            "description": "占星術のサインの今日の運勢を取得します。",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "sign": {
-                        "type": "string",
-                        "description": "牡牛座や水瓶座などの占星術のサイン",
-                    }
-                },
-                "required": ["sign"],
-            },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_lucky_item",
-            "description": "星座や運勢から今日のラッキーアイテムを取得します。",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "sign": {
-                        "type": "string",
-                        "description": "牡牛座や水瓶座などの占星術のサイン",
-                    }
-                },
-                "required": ["sign"],
-            },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_zodiac_sign",
-            "description": "誕生日から星座を判定します。",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "birthday": {
-                        "type": "string",
-                        "description": "YYYY-MM-DD形式の誕生日",
-                    }
-                },
-                "required": ["birthday"],
-            },
-        },
-    },
-]
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from horoscope_common.tool_registry import ToolRegistry
 
-def get_horoscope(sign):
-    """星座から今日の運勢を取得するツール"""
+# モデル用の呼び出し可能なツールのレジストリ
+# スキーマは関数のシグネチャとdocstringから生成される
+registry = ToolRegistry()
+
+@registry.tool
+def get_horoscope(sign: str) -> str:
+    """
+    占星術のサインの今日の運勢を取得します。
+
+    Args:
+        sign (str): 牡牛座や水瓶座などの占星術のサイン
+    """
     # ダミー実装
     return f"{sign}: 来週の火曜日にあなたは赤ちゃんのカワウソと友達になるでしょう。"
 
-def get_lucky_item(sign):
+@registry.tool
+def get_lucky_item(sign: str) -> str:
     """
-    ラッキーアイテム提案ツール
-    星座や運勢から今日持つと良いアイテムを返す。
+    星座や運勢から今日のラッキーアイテムを取得します。
+
+    Args:
+        sign (str): 牡牛座や水瓶座などの占星術のサイン
     """
     # ダミー実装
     return f"{sign}の今日のラッキーアイテムは「水色のハンカチ」です。"
 
-def get_zodiac_sign(birthday):
+# サインが判明していて、今回の発言に誕生日が含まれない場合は不要なので送らない
+@registry.tool(skip_when=lambda ctx: bool(ctx.get("sign")) and not ctx.get("birthdays"))
+def get_zodiac_sign(birthday: str) -> str:
     """
-    誕生日から星座判定ツール
-    誕生日（YYYY-MM-DD）を入力すると星座名を返す。
+    誕生日から星座を判定します。
+
+    Args:
+        birthday (str): YYYY-MM-DD形式の誕生日
     """
     # ダミー実装
     import re
@@ -1,5 +1,10 @@
 from openai import OpenAI
 import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from horoscope_common.tool_registry import ToolRegistry
 
 # ===========================
 # utils
@@ -46,30 +51,22 @@ def convert_to_serializable(obj):
 # client = OpenAI()
 client = OpenAI(base_url="http://localhost:1234/v1", api_key="not-needed")
 
-# 1. モデル用の呼び出し可能なツールのリストを定義
-tools = [
-    {
-        "type": "function",
-        "function": {
-            "name": "get_horoscope",
-            "description": "占星術のサインの今日の運勢を取得します。",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "sign": {
-                        "type": "string",
-                        "description": "牡牛座や水瓶座などの占星術のサイン",
-                    }
-                },
-                "required": ["sign"],
-            },
-        },
-    }
-]
+# 1. モデル用の呼び出し可能なツールを定義
+# スキーマは関数のシグネチャとdocstringから生成される
+registry = ToolRegistry()
 
-def get_horoscope(sign):
+@registry.tool
+def get_horoscope(sign: str) -> str:
+    """
+    占星術のサインの今日の運勢を取得します。
+
+    Args:
+        sign (str): 牡牛座や水瓶座などの占星術のサイン
+    """
     return f"{sign}: 来週の火曜日にあなたは赤ちゃんのカワウソと友達になるでしょう。"
 
+tools = registry.schemas()
+
 # 時間をかけて追加していく実行中の入力リストを作成
 messages = [
     {"role": "user", "content": "私の運勢はどうですか？私は水瓶座です。"}
@@ -4,11 +4,16 @@
 from openai import AsyncOpenAI
 from agents import Agent, OpenAIChatCompletionsModel, ItemHelpers, Runner, set_tracing_disabled
 import os
+import sys
 
 import json
-from typing import Optional, List
-from tools import get_horoscope, get_lucky_item, get_zodiac_sign
-from session import JSONLSession
+from typing import Dict, Optional, List
+from tools import registry, function_tools
+from session import SessionManager, session_manager
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from horoscope_common.answer_cache import AnswerCache
+from horoscope_common.conversation import ConversationState
 
 # トレースを無効化
 set_tracing_disabled(True)
@@ -21,10 +26,22 @@ class HoroscopeAgent:
     DEFAULT_BASE_URL = "http://localhost:1234/v1"
     DEFAULT_API_KEY = "not-needed"
     DEFAULT_MODEL = "openai/gpt-oss-20b"
+    DEFAULT_CACHE_THRESHOLD = AnswerCache.DEFAULT_THRESHOLD
 
-    def __init__(self, session_id: Optional[str] = None):
+    def __init__(
+        self,
+        session_id: Optional[str] = None,
+        answer_cache: Optional[AnswerCache] = None,
+        cache_threshold: float = DEFAULT_CACHE_THRESHOLD,
+        sessions: Optional[SessionManager] = None,
+    ):
         # 会話履歴の管理は SDK セッションへ移行
-        self.session = JSONLSession(session_id or "default")
+        # 同じ session_id のセッションはプロセス内で共有される
+        self.session = (sessions or session_manager).get(session_id or "default")
+        # 類似質問の回答キャッシュ（複数エージェントで共有する場合は外から渡す）と、
+        # 会話中に判明したユーザー自身のサイン（キャッシュのスコープとツール選択に使用）
+        self.answer_cache = answer_cache if answer_cache is not None else AnswerCache(threshold=cache_threshold)
+        self.state = ConversationState()
         module_dir = os.path.dirname(__file__)
 
         # modelにはlm-studioのgpt-oss-20bを指定
@@ -41,7 +58,7 @@ class HoroscopeAgent:
             name="Horoscope Agent",
             instructions=self._load_instructions("instruction.txt"),
             model=self.gpt_oss_model,
-            tools=[get_horoscope, get_lucky_item, get_zodiac_sign],
+            tools=function_tools(registry.names),
         )
 
     def _load_instructions(self, filepath):
@@ -55,13 +72,38 @@ class HoroscopeAgent:
 
     async def run(self, user_input):
 
+        # セッションは session_id ごとに共有・永続化されているため、
+        # 毎ターン履歴からユーザー自身のサインを復元してからターンを開始する
+        self.state.restore(await self.session.get_items())
+        self.state.start_turn(user_input)
+
+        # 類似の質問に回答済みであれば、LLMを呼び出さずにキャッシュの回答を返す
+        cached = self.state.lookup_answer(self.answer_cache)
+        if cached is not None:
+            await self.session.add_items([
+                {"role": "user", "content": user_input},
+                {"role": "assistant", "content": cached},
+            ])
+            yield f"Agent({self.horoscope_agent.name}): Message output:\n {cached}\n"
+            return
+
+        # 会話の文脈から今回のターンで送るツールを選ぶ
+        # Runner はターン内のすべてのモデル呼び出しでツールを送るため、削減量は呼び出し回数分を後で記録する
+        selection = registry.select(self.state.tool_context(), record=False)
+        agent = self.horoscope_agent
+        if selection.saved_tokens:
+            agent = agent.clone(tools=function_tools(selection.names))
+            yield f"Tools selected: {', '.join(selection.names)}\n"
+
         result = Runner.run_streamed(
-            self.horoscope_agent,
+            agent,
             input=user_input,
             session=self.session,
         )
         
         assistant_texts: List[str] = []
+        # call_id -> ツール名（ツールの出力アイテムにはツール名が含まれないため）
+        call_names: Dict[str, str] = {}
         async for event in result.stream_events():
             # We'll ignore the raw responses event deltas
             if event.type == "raw_response_event":
@@ -73,10 +115,24 @@ class HoroscopeAgent:
             # When items are generated, print them
             elif event.type == "run_item_stream_event":
                 if event.item.type == "tool_call_item":
+                    call_names[event.item.raw_item.call_id] = event.item.raw_item.name
                     yield f"Agent({event.item.agent.name}): tooled: {event.item.raw_item.name}, with args: {event.item.raw_item.arguments}\n"
                 elif event.item.type == "tool_call_output_item":
+                    call_id = event.item.raw_item.get("call_id") if isinstance(event.item.raw_item, dict) else None
+                    self.state.observe_tool_result(call_names.get(call_id), event.item.output)
                     yield f"Agent({event.item.agent.name}): tool output: {event.item.output}\n"
                 elif event.item.type == "message_output_item":
-                    yield f"Agent({event.item.agent.name}): Message output:\n {ItemHelpers.text_message_output(event.item)}\n"
+                    text = ItemHelpers.text_message_output(event.item)
+                    assistant_texts.append(text)
+                    yield f"Agent({event.item.agent.name}): Message output:\n {text}\n"
                 else:
-                    pass  # Ignore other event types
\ No newline at end of file
+                    pass  # Ignore other event types
+
+        if selection.saved_tokens:
+            requests = len(result.raw_responses)
+            saved = registry.record(selection, requests)
+            yield f"Tools pruned: saved ~{saved} tokens over {requests} model calls (total {registry.saved_tokens})\n"
+
+        # 最終応答をキャッシュに登録
+        if assistant_texts:
+            self.state.store_answer(self.answer_cache, assistant_texts[-1])
\ No newline at end of file
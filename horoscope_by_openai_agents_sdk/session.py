@@ -2,7 +2,10 @@ from __future__ import annotations
 
 import os
 import json
-from typing import List, Optional, Any
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Tuple
 
 from agents.memory.session import SessionABC
 from agents.items import TResponseInputItem
@@ -15,15 +18,45 @@ class JSONLSession(SessionABC):
     - `logs/sessions/{session_id}.jsonl` に会話アイテムを逐次保存
     - 同一プロセス内ではメモリキャッシュを使用して高速化
     - アイテムは JSON シリアライズ可能な辞書として保持
+    - `SessionManager` 経由で生成した場合、メモリキャッシュは上限に応じて解放され、
+      次回アクセス時にファイルから再読み込みされる
+    - 読み込み・変更・書き込みはセッションごとのロック内で行うため、
+      別スレッドからの解放と競合してもファイルが壊れない
     """
 
-    def __init__(self, session_id: str, base_dir: Optional[str] = None):
+    def __init__(
+        self,
+        session_id: str,
+        base_dir: Optional[str] = None,
+        manager: Optional[SessionManager] = None,
+    ):
         self.session_id = session_id
         module_dir = os.path.dirname(__file__)
         self.base_dir = base_dir or os.path.join(module_dir, "logs", "sessions")
         self.path = os.path.join(self.base_dir, f"{session_id}.jsonl")
         self._items: List[TResponseInputItem] = []
         self._loaded = False
+        # メモリ上のアイテムの JSONL 換算サイズ（バイト）
+        self._bytes = 0
+        self._manager = manager
+        # 読み込み〜変更〜書き込みの間、解放（unload）と競合しないためのロック
+        # マネージャーへの通知はロックの外で行う（ロック順序は常にマネージャー → セッション）
+        self._lock = threading.RLock()
+
+    @property
+    def item_count(self) -> int:
+        return len(self._items)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def unload(self) -> None:
+        """メモリキャッシュを解放する。次回アクセス時にファイルから再読み込みする。"""
+        with self._lock:
+            self._items = []
+            self._bytes = 0
+            self._loaded = False
 
     # -----------------------------
     #  内部ユーティリティ
@@ -51,10 +84,12 @@ class JSONLSession(SessionABC):
                     pass
         return str(item)
 
-    def _load_if_needed(self) -> None:
+    def _load_if_needed(self) -> bool:
+        """未読み込みならファイルから読み込む。メモリキャッシュを使えた場合は True を返す。"""
         if self._loaded:
-            return
+            return True
         self._items = []
+        self._bytes = 0
         if os.path.exists(self.path):
             try:
                 with open(self.path, "r", encoding="utf-8") as f:
@@ -67,18 +102,29 @@ class JSONLSession(SessionABC):
                         except Exception:
                             continue
                         self._items.append(obj)
+                        self._bytes += len(line.encode("utf-8")) + 1
             except Exception:
                 self._items = []
+                self._bytes = 0
         self._loaded = True
+        return False
+
+    def _dumps(self, item: Any) -> str:
+        return json.dumps(self._to_jsonable(item), ensure_ascii=False) + "\n"
+
+    def _notify(self, hit: bool) -> None:
+        """マネージャーにアクセスとサイズの変化を通知する。"""
+        if self._manager is not None:
+            self._manager._touch(self, hit)
 
     def _rewrite_file(self) -> None:
         """全アイテムを書き戻し。pop/clear 用。"""
         self._ensure_dir()
+        lines = [self._dumps(it) for it in self._items]
+        self._bytes = sum(len(line.encode("utf-8")) for line in lines)
         try:
             with open(self.path, "w", encoding="utf-8") as f:
-                for it in self._items:
-                    f.write(json.dumps(self._to_jsonable(it), ensure_ascii=False))
-                    f.write("\n")
+                f.writelines(lines)
         except Exception:
             pass
 
@@ -86,42 +132,143 @@ class JSONLSession(SessionABC):
     #  SessionABC 実装
     # -----------------------------
     async def get_items(self, limit: int | None = None) -> List[TResponseInputItem]:
-        self._load_if_needed()
-        if limit is None or limit >= len(self._items):
-            return list(self._items)
-        return list(self._items[-limit:])
+        with self._lock:
+            hit = self._load_if_needed()
+            if limit is None or limit >= len(self._items):
+                items = list(self._items)
+            else:
+                items = list(self._items[-limit:])
+        self._notify(hit)
+        return items
 
     async def add_items(self, items: List[TResponseInputItem]) -> None:
         if not items:
             return
-        self._load_if_needed()
-        self._items.extend(items)
-        # 逐次でファイルに追記
-        self._ensure_dir()
-        try:
-            with open(self.path, "a", encoding="utf-8") as f:
-                for it in items:
-                    f.write(json.dumps(self._to_jsonable(it), ensure_ascii=False))
-                    f.write("\n")
-        except Exception:
-            pass
+        with self._lock:
+            hit = self._load_if_needed()
+            self._items.extend(items)
+            lines = [self._dumps(it) for it in items]
+            self._bytes += sum(len(line.encode("utf-8")) for line in lines)
+            # 逐次でファイルに追記
+            self._ensure_dir()
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.writelines(lines)
+            except Exception:
+                pass
+        self._notify(hit)
 
     async def pop_item(self) -> TResponseInputItem | None:
-        self._load_if_needed()
-        if not self._items:
-            return None
-        last = self._items.pop()
-        self._rewrite_file()
+        with self._lock:
+            hit = self._load_if_needed()
+            last = self._items.pop() if self._items else None
+            if last is not None:
+                self._rewrite_file()
+        self._notify(hit)
         return last
 
     async def clear_session(self) -> None:
-        self._load_if_needed()
-        self._items.clear()
-        # ファイルを空にする（存在すれば）
-        try:
-            if os.path.exists(self.path):
-                with open(self.path, "w", encoding="utf-8") as f:
-                    f.truncate(0)
-        except Exception:
-            pass
+        with self._lock:
+            hit = self._load_if_needed()
+            self._items.clear()
+            self._bytes = 0
+            # ファイルを空にする（存在すれば）
+            try:
+                if os.path.exists(self.path):
+                    with open(self.path, "w", encoding="utf-8") as f:
+                        f.truncate(0)
+            except Exception:
+                pass
+        self._notify(hit)
+
+class SessionManager:
+    """
+    プロセス全体で `JSONLSession` を共有・管理するマネージャー。
+
+    - 同じ session_id には同じインスタンスを返す（同時リクエストでも履歴が分かれない）
+    - メモリ上のアイテム数・バイト数の合計が上限を超えたら、最も使われていない
+      セッションのメモリキャッシュを解放する（ファイルから遅延再読み込み）
+    - `stats()` でキャッシュサイズとヒット率を取得できる
+    """
+
+    DEFAULT_MAX_ITEMS = 10_000
+
+    def __init__(
+        self,
+        max_items: Optional[int] = DEFAULT_MAX_ITEMS,
+        max_bytes: Optional[int] = None,
+        base_dir: Optional[str] = None,
+    ):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.base_dir = base_dir
+        self._lock = threading.RLock()
+        # 利用中のセッション（どこからも参照されなくなったものは自動で消える）
+        self._sessions: "weakref.WeakValueDictionary[str, JSONLSession]" = weakref.WeakValueDictionary()
+        # メモリに読み込まれているセッションの LRU: session_id -> (session, items, bytes)
+        self._loaded: "OrderedDict[str, Tuple[JSONLSession, int, int]]" = OrderedDict()
+        self._items = 0
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, session_id: str) -> JSONLSession:
+        """session_id に対応するセッションを返す。"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = JSONLSession(session_id, base_dir=self.base_dir, manager=self)
+                self._sessions[session_id] = session
+            return session
+
+    def stats(self) -> Dict[str, Any]:
+        """監視用の統計情報を返す。"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "sessions": len(self._sessions),
+                "loaded_sessions": len(self._loaded),
+                "items": self._items,
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+            }
+
+    # -----------------------------
+    #  内部処理
+    # -----------------------------
+    def _touch(self, session: JSONLSession, hit: bool) -> None:
+        """
+        セッションへのアクセスを記録し、上限を超えていれば古いセッションを解放する。
+        セッションのロックを持たない状態で呼ばれる（解放時に各セッションのロックを取る）。
+        """
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            _, items, size = self._loaded.pop(session.session_id, (session, 0, 0))
+            self._items += session.item_count - items
+            self._bytes += session.size_bytes - size
+            self._loaded[session.session_id] = (session, session.item_count, session.size_bytes)
+            # アクセス中のセッション自体は解放しない
+            while len(self._loaded) > 1 and self._over_limit():
+                _, (oldest, items, size) = self._loaded.popitem(last=False)
+                self._items -= items
+                self._bytes -= size
+                oldest.unload()
+                self.evictions += 1
+
+    def _over_limit(self) -> bool:
+        if self.max_items is not None and self._items > self.max_items:
+            return True
+        if self.max_bytes is not None and self._bytes > self.max_bytes:
+            return True
+        return False
+
 
+# プロセス全体で共有するデフォルトのマネージャー
+session_manager = SessionManager()
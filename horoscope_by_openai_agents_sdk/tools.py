@@ -1,9 +1,21 @@
 # ===========================
 # tools
 # ===========================
-from agents import function_tool
+import os
+import sys
+import json
+from typing import Any, Dict, Iterable, List
 
-@function_tool
+from agents import FunctionTool, RunContextWrapper
+from agents.tool import default_tool_error_function
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from horoscope_common.tool_registry import RegisteredTool, ToolRegistry
+
+# スキーマは関数のシグネチャとdocstringからレジストリで一度だけ生成する
+registry = ToolRegistry()
+
+@registry.tool
 def get_horoscope(sign: str) -> str:
     """
     星座名から今日の運勢を取得するツール。
@@ -16,7 +28,7 @@ def get_horoscope(sign: str) -> str:
     # ダミー実装
     return f"{sign}: 来週の火曜日にあなたは赤ちゃんのカワウソと友達になるでしょう。"
 
-@function_tool
+@registry.tool
 def get_lucky_item(sign: str) -> str:
     """
     星座名から今日のラッキーアイテムを提案するツール。
@@ -29,7 +41,8 @@ def get_lucky_item(sign: str) -> str:
     # ダミー実装
     return f"{sign}の今日のラッキーアイテムは「水色のハンカチ」です。"
 
-@function_tool
+# サインが判明していて、今回の発言に誕生日が含まれない場合は不要なので送らない
+@registry.tool(skip_when=lambda ctx: bool(ctx.get("sign")) and not ctx.get("birthdays"))
 def get_zodiac_sign(birthday: str) -> str:
     """
     誕生日から星座名を判定するツール。
@@ -45,3 +58,34 @@ def get_zodiac_sign(birthday: str) -> str:
         return "不正な日付形式です。YYYY-MM-DD形式で入力してください。"
     else:
         return "水瓶座"
+
+# -----------------------------
+#  SDK 向けの変換
+# -----------------------------
+def _to_function_tool(tool: RegisteredTool) -> FunctionTool:
+    """
+    レジストリのツールを SDK の FunctionTool に変換する。
+    function_tool と同様に、全引数が必須なら strict スキーマにし、
+    実行時のエラーは例外にせずエラーメッセージとしてモデルに返す。
+    """
+    async def on_invoke_tool(ctx: RunContextWrapper[Any], arguments: str) -> Any:
+        try:
+            return tool.func(**json.loads(arguments or "{}"))
+        except Exception as e:
+            return default_tool_error_function(ctx, e)
+
+    params = {**tool.parameters, "additionalProperties": False}
+    strict = set(params["required"]) == set(params["properties"])
+    return FunctionTool(
+        name=tool.name,
+        description=tool.description,
+        params_json_schema=params if strict else tool.parameters,
+        on_invoke_tool=on_invoke_tool,
+        strict_json_schema=strict,
+    )
+
+_function_tools: Dict[str, FunctionTool] = {t.name: _to_function_tool(t) for t in registry}
+
+def function_tools(names: Iterable[str]) -> List[FunctionTool]:
+    """指定した名前の FunctionTool を返す"""
+    return [_function_tools[name] for name in names]
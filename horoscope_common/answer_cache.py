@@ -0,0 +1,285 @@
+# ===========================
+# answer cache
+# ===========================
+from __future__ import annotations
+
+import hashlib
+from array import array
+import re
+import unicodedata
+from collections import Counter, OrderedDict
+from datetime import date
+from operator import eq
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple, Union
+
+# 占星術のサイン一覧（質問文からのサイン抽出に使用）
+ZODIAC_SIGNS = (
+    "牡羊座", "牡牛座", "双子座", "蟹座", "獅子座", "乙女座",
+    "天秤座", "蠍座", "射手座", "山羊座", "水瓶座", "魚座",
+)
+
+# 質問の意味に影響しない依頼表現（正規化時に除去）
+FILLER_PHRASES = (
+    "を教えてください", "を教えて", "教えてください", "教えて",
+    "お願いします", "おねがいします", "ください",
+)
+
+# 直前の会話に依存する追加質問の目印（含まれる質問はキャッシュしない）
+FOLLOWUP_MARKERS = (
+    "それ", "その", "そっち", "あれ", "さっき", "先ほど", "じゃあ", "では",
+    "彼", "彼女", "友達", "他の", "ほかの", "もう一度", "もっと",
+)
+
+# 文脈に依存せずに意味が通る質問とみなす正規化後の最小文字数
+MIN_QUESTION_CHARS = 6
+
+_SIGN_PATTERN = re.compile("|".join(ZODIAC_SIGNS))
+# 1990-01-25 / 1990/1/25 / 1990.1.25 / 1990年1月25日 / 1月25日 / 1/25
+_DATE_PATTERN = re.compile(
+    r"\d{4}[-/.]\d{1,2}[-/.]\d{1,2}|\d{4}年\d{1,2}月\d{1,2}日|\d{1,2}月\d{1,2}日|\d{1,2}/\d{1,2}"
+)
+
+
+def normalize_text(text: str) -> str:
+    """
+    表記ゆれを吸収するためにテキストを正規化する。
+
+    - NFKC で全角/半角を統一し、英字は小文字化
+    - 句読点・記号・空白を除去
+    - 「教えて」などの依頼表現を除去
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = "".join(
+        ch for ch in text
+        if not unicodedata.category(ch).startswith(("P", "S", "Z", "C"))
+    )
+    for phrase in FILLER_PHRASES:
+        text = text.replace(phrase, "")
+    return text
+
+
+def find_signs(text: str) -> Tuple[str, ...]:
+    """テキスト中に現れるサインを出現順・重複なしで返す。"""
+    found: List[str] = []
+    for sign in _SIGN_PATTERN.findall(normalize_text(text)):
+        if sign not in found:
+            found.append(sign)
+    return tuple(found)
+
+
+def find_birthdays(text: str) -> Tuple[str, ...]:
+    """テキスト中に現れる日付（誕生日の候補）を返す。"""
+    return tuple(_DATE_PATTERN.findall(unicodedata.normalize("NFKC", text)))
+
+
+def is_cacheable(text: str) -> bool:
+    """
+    直前の会話に依存せずに意味が通る質問かどうかを判定する。
+    「はい」などの短い返答や「それ」「じゃあ」を含む追加質問はキャッシュの対象外にする。
+    """
+    normalized = normalize_text(text)
+    if len(normalized) < MIN_QUESTION_CHARS:
+        return False
+    return not any(marker in normalized for marker in FOLLOWUP_MARKERS)
+
+
+class AnswerCache:
+    """
+    言い回しの違う同じ質問に対して過去の回答を返す類似度ベースのキャッシュ。
+
+    - 正規化したテキストの文字 n-gram から MinHash シグネチャを計算
+    - LSH のバンドごとのバケットで候補を絞り込むため、件数が増えても検索は定数時間
+    - スコープ（日付やサインなどのツール文脈）が一致するエントリのみを対象にする
+    - 直前の会話に依存する短い返答や追加質問は登録・検索しない
+    - 件数が上限を超えたら最も使われていないエントリから破棄
+
+    メモリ使用量は回答文字列を除いて 1 エントリあたり約 1.5 KB
+    （32 ビットのシグネチャ 64 個とバンドごとのバケット）。
+    既定の上限 10 万件で約 150 MB、100 万件なら約 1.5 GB を見込む。
+    """
+
+    DEFAULT_THRESHOLD = 0.7
+    DEFAULT_NGRAM = 2
+    DEFAULT_BANDS = 16
+    DEFAULT_ROWS = 4
+    DEFAULT_MAX_ENTRIES = 100_000
+    DEFAULT_MAX_GRAMS = 50_000
+    # 1 バケットに保持するエントリ数の上限（定型的な質問が大量に集まっても検索時間を抑える）
+    DEFAULT_MAX_BUCKET = 32
+    # 類似度を計算する候補数の上限（一致したバンド数の多い順）
+    DEFAULT_MAX_CANDIDATES = 16
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_THRESHOLD,
+        ngram: int = DEFAULT_NGRAM,
+        bands: int = DEFAULT_BANDS,
+        rows: int = DEFAULT_ROWS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_grams: int = DEFAULT_MAX_GRAMS,
+        max_bucket: int = DEFAULT_MAX_BUCKET,
+        max_candidates: int = DEFAULT_MAX_CANDIDATES,
+        seed: int = 1,
+    ):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError("threshold must be in (0, 1]")
+        self.threshold = threshold
+        self.ngram = ngram
+        self.bands = bands
+        self.rows = rows
+        self.max_entries = max_entries
+        self.max_grams = max_grams
+        self.max_bucket = max_bucket
+        self.max_candidates = max_candidates
+        self._num_hashes = bands * rows
+        self._salt = seed.to_bytes(8, "big")
+        # entry_id -> (scope, signature, answer)
+        self._entries: "OrderedDict[int, Tuple[Hashable, array, str]]" = OrderedDict()
+        # scope -> {バンドのキー: entry_id（1 件のとき）または entry_id のリスト}
+        self._buckets: Dict[Hashable, Dict[int, Union[int, List[int]]]] = {}
+        # スコープのタプルをエントリ間で共有するための辞書
+        self._scopes: Dict[Hashable, Hashable] = {}
+        self._next_id = 0
+        # n-gram -> 各ハッシュ関数での値。同じ n-gram のハッシュ計算は一度だけ行う
+        self._gram_hashes: Dict[str, array] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # -----------------------------
+    #  スコープ
+    # -----------------------------
+    @staticmethod
+    def make_scope(text: str, signs: Iterable[str] = (), day: Optional[date] = None) -> Hashable:
+        """
+        日付・サイン・質問文中の誕生日からスコープを作る。
+        どのサインを含めるかは呼び出し側（`ConversationState`）で決める。
+        """
+        day = day or date.today()
+        return (day.isoformat(), tuple(sorted(signs)), find_birthdays(text))
+
+    # -----------------------------
+    #  MinHash / LSH
+    # -----------------------------
+    def _grams(self, text: str) -> Set[str]:
+        normalized = normalize_text(text)
+        if len(normalized) <= self.ngram:
+            return {normalized} if normalized else set()
+        return {normalized[i:i + self.ngram] for i in range(len(normalized) - self.ngram + 1)}
+
+    def _gram_hash(self, gram: str) -> array:
+        """
+        n-gram の各ハッシュ関数での値を返す（計算結果はキャッシュする）。
+        SHAKE128 の出力を 4 バイトずつ区切り、それぞれを独立したハッシュ関数の値として使う。
+        """
+        hashes = self._gram_hashes.get(gram)
+        if hashes is None:
+            digest = hashlib.shake_128(self._salt + gram.encode("utf-8")).digest(4 * self._num_hashes)
+            hashes = array("I", digest)
+            if len(self._gram_hashes) >= self.max_grams:
+                self._gram_hashes.clear()
+            self._gram_hashes[gram] = hashes
+        return hashes
+
+    def _signature(self, text: str) -> Optional[array]:
+        grams = self._grams(text)
+        if not grams:
+            return None
+        # ハッシュ関数ごとの最小値を n-gram 全体でまとめて取る
+        return array("I", map(min, zip(*map(self._gram_hash, grams))))
+
+    def _band_keys(self, signature: array) -> List[int]:
+        """バンドごとのシグネチャを 1 つの整数キーにまとめる。"""
+        raw = signature.tobytes()
+        width = 4 * self.rows
+        return [hash((band, raw[band * width:(band + 1) * width])) for band in range(self.bands)]
+
+    @staticmethod
+    def _similarity(sig1: array, sig2: array) -> float:
+        """一致する要素の割合から Jaccard 係数を推定する。"""
+        return sum(map(eq, sig1, sig2)) / len(sig1)
+
+    # -----------------------------
+    #  公開 API
+    # -----------------------------
+    def get(self, text: str, scope: Hashable) -> Optional[str]:
+        """スコープ内で閾値以上に類似した質問があればその回答を返す。"""
+        if not is_cacheable(text):
+            return None
+        buckets = self._buckets.get(scope)
+        if buckets is None:
+            return None
+        signature = self._signature(text)
+        if signature is None:
+            return None
+
+        # 一致したバンド数の多い候補から順に類似度を計算する
+        hits: Counter = Counter()
+        for key in self._band_keys(signature):
+            bucket = buckets.get(key)
+            if bucket is None:
+                continue
+            if isinstance(bucket, int):
+                hits[bucket] += 1
+            else:
+                hits.update(bucket)
+
+        best_id, best_score = None, self.threshold
+        for entry_id, _ in hits.most_common(self.max_candidates):
+            score = self._similarity(signature, self._entries[entry_id][1])
+            if score >= best_score:
+                best_id, best_score = entry_id, score
+        if best_id is None:
+            return None
+        self._entries.move_to_end(best_id)
+        return self._entries[best_id][2]
+
+    def put(self, text: str, scope: Hashable, answer: str) -> None:
+        """質問と回答をスコープ付きで登録する。"""
+        if not is_cacheable(text):
+            return
+        signature = self._signature(text)
+        if signature is None or not answer:
+            return
+        scope = self._scopes.setdefault(scope, scope)
+        buckets = self._buckets.setdefault(scope, {})
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (scope, signature, answer)
+        for key in self._band_keys(signature):
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = entry_id
+            elif isinstance(bucket, int):
+                buckets[key] = [bucket, entry_id]
+            else:
+                bucket.append(entry_id)
+                if len(bucket) > self.max_bucket:
+                    # 古いエントリはこのバンドからは辿れなくなる（他のバンドには残る）
+                    del bucket[0]
+        while len(self._entries) > self.max_entries:
+            self._evict()
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._buckets.clear()
+        self._scopes.clear()
+        self._gram_hashes.clear()
+
+    def _evict(self) -> None:
+        entry_id, (scope, signature, _) = self._entries.popitem(last=False)
+        buckets = self._buckets[scope]
+        for key in self._band_keys(signature):
+            bucket = buckets.get(key)
+            if bucket is None:
+                continue
+            if isinstance(bucket, int):
+                if bucket == entry_id:
+                    del buckets[key]
+            elif entry_id in bucket:
+                bucket.remove(entry_id)
+                if len(bucket) == 1:
+                    buckets[key] = bucket[0]
+        if not buckets:
+            del self._buckets[scope]
+            del self._scopes[scope]
@@ -0,0 +1,141 @@
+# ===========================
+# conversation state
+# ===========================
+from __future__ import annotations
+
+import re
+from datetime import date
+from typing import Any, Dict, Hashable, Iterable, Mapping, Optional
+
+from horoscope_common.answer_cache import (
+    ZODIAC_SIGNS,
+    AnswerCache,
+    find_birthdays,
+    find_signs,
+    normalize_text,
+)
+
+# 一人称の表現（ユーザー自身についての質問・発言の目印）
+FIRST_PERSON = ("私", "わたし", "僕", "ぼく", "俺", "おれ", "自分", "うち")
+
+# ユーザー以外の人物を指す表現（この発言中の星座判定はユーザー自身のものとみなさない）
+THIRD_PARTY_MARKERS = (
+    "友達", "友人", "彼", "彼女", "妹", "弟", "姉", "兄",
+    "母", "父", "子供", "子ども", "娘", "息子", "夫", "妻", "同僚",
+)
+
+# 「私は水瓶座です」のような自分のサインの明示（正規化後のテキストに適用）
+_SELF_STATEMENT = re.compile(
+    "(?:" + "|".join(FIRST_PERSON) + ")(?:の星座)?(?:は|も|って)"
+    "(" + "|".join(ZODIAC_SIGNS) + ")(?:です|だ|なの|なん|生まれ|$)"
+)
+
+
+def find_self_sign(text: str) -> Optional[str]:
+    """「私は水瓶座です」のようにユーザー自身のサインを明示していればそれを返す。"""
+    match = _SELF_STATEMENT.search(normalize_text(text))
+    return match.group(1) if match else None
+
+
+class ConversationState:
+    """
+    会話中に判明したユーザー自身のサインを管理し、回答キャッシュのスコープを決める。
+
+    - ユーザー自身のサインは「私は〇〇座です」という発言か、
+      他人に言及していないターンでの get_zodiac_sign の結果からのみ記録する
+    - 発言中で言及されただけのサイン（友達のサインなど）はユーザーのサインにしない
+    - サインに言及しない・一人称を含む質問は、ユーザー自身のサインが不明ならキャッシュしない
+    """
+
+    def __init__(self, own_sign: Optional[str] = None):
+        self.own_sign = own_sign
+        self.user_input = ""
+        self._mentions_third_party = False
+        self._scope: Optional[Hashable] = None
+
+    # -----------------------------
+    #  会話の観測
+    # -----------------------------
+    def start_turn(self, user_input: str) -> None:
+        """ユーザーの発言を受け取り、ターンを開始する。"""
+        self._observe_user_text(user_input)
+        self.user_input = user_input
+        self._scope = self.cache_scope()
+
+    def observe_tool_result(self, tool_name: str, result: Any) -> None:
+        """ツールの実行結果からユーザー自身のサインを記録する。"""
+        if tool_name == "get_zodiac_sign" and result in ZODIAC_SIGNS and not self._mentions_third_party:
+            self.own_sign = result
+
+    def restore(self, items: Iterable[Mapping[str, Any]]) -> None:
+        """
+        保存済みの会話履歴（Responses API の入力アイテム）からユーザー自身のサインを復元する。
+        同じセッションを別のインスタンスで再開した場合に使う。
+        """
+        self.own_sign = None
+        self._mentions_third_party = False
+        call_names: Dict[str, str] = {}
+        for item in items:
+            if not isinstance(item, Mapping):
+                continue
+            if item.get("role") == "user":
+                self._observe_user_text(_item_text(item.get("content")))
+            elif item.get("type") == "function_call":
+                call_names[item.get("call_id")] = item.get("name")
+            elif item.get("type") == "function_call_output":
+                self.observe_tool_result(call_names.get(item.get("call_id")), item.get("output"))
+
+    def _observe_user_text(self, text: str) -> None:
+        normalized = normalize_text(text)
+        self._mentions_third_party = any(marker in normalized for marker in THIRD_PARTY_MARKERS)
+        sign = find_self_sign(text)
+        if sign is not None:
+            self.own_sign = sign
+
+    # -----------------------------
+    #  ツール選択・キャッシュ
+    # -----------------------------
+    def tool_context(self) -> Dict[str, Any]:
+        """ツールレジストリの選択ポリシーに渡す文脈。"""
+        return {"sign": self.own_sign, "birthdays": find_birthdays(self.user_input)}
+
+    def cache_scope(self, day: Optional[date] = None) -> Optional[Hashable]:
+        """
+        現在のターンの質問のキャッシュスコープを返す。キャッシュすべきでない場合は None。
+        サインに言及しない質問や一人称を含む質問はユーザー自身のサインをスコープに含める。
+        """
+        text = self.user_input
+        signs = set(find_signs(text))
+        normalized = normalize_text(text)
+        if not signs or any(word in normalized for word in FIRST_PERSON):
+            if self.own_sign is None:
+                return None
+            signs.add(self.own_sign)
+        return AnswerCache.make_scope(text, signs=signs, day=day)
+
+    def lookup_answer(self, cache: AnswerCache) -> Optional[str]:
+        """ターン開始時のスコープでキャッシュを検索する。"""
+        if self._scope is None:
+            return None
+        return cache.get(self.user_input, self._scope)
+
+    def store_answer(self, cache: AnswerCache, answer: Optional[str]) -> None:
+        """
+        ターンの最終応答をキャッシュに登録する。
+        ターン中にユーザー自身のサインが判明・変化した場合は回答のスコープが変わるので登録しない。
+        """
+        if self._scope is None or not answer:
+            return
+        if self.cache_scope() == self._scope:
+            cache.put(self.user_input, self._scope, answer)
+
+
+def _item_text(content: Any) -> str:
+    """メッセージの content（文字列またはパートのリスト）からテキストを取り出す。"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            part.get("text", "") for part in content if isinstance(part, Mapping)
+        )
+    return ""
@@ -0,0 +1,204 @@
+# ===========================
+# tool registry
+# ===========================
+from __future__ import annotations
+
+import inspect
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+# Python の型注釈から JSON Schema の型への対応
+_JSON_TYPES = {
+    str: "string",
+    int: "integer",
+    float: "number",
+    bool: "boolean",
+    list: "array",
+    dict: "object",
+}
+
+_ARG_LINE = re.compile(r"^\s*(\w+)\s*(?:\([^)]*\))?\s*:\s*(.+)$")
+_SECTION = re.compile(r"^\s*(Args|Returns|Raises)\s*:\s*$")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    プロンプトのトークン数を概算する。
+    ASCII はおよそ 4 文字で 1 トークン、それ以外（日本語など）は 1 文字 1 トークンとみなす。
+    """
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def _parse_docstring(doc: Optional[str]) -> Tuple[str, Dict[str, str]]:
+    """docstring から説明文と Args セクションの引数説明を取り出す。"""
+    description: List[str] = []
+    arg_docs: Dict[str, str] = {}
+    section = None
+    for line in inspect.cleandoc(doc or "").splitlines():
+        match = _SECTION.match(line)
+        if match:
+            section = match.group(1)
+            continue
+        if section is None:
+            if line.strip():
+                description.append(line.strip())
+        elif section == "Args":
+            match = _ARG_LINE.match(line)
+            if match:
+                arg_docs[match.group(1)] = match.group(2).strip()
+    return "".join(description), arg_docs
+
+
+@dataclass(frozen=True)
+class RegisteredTool:
+    """登録済みツール。スキーマとそのシリアライズ結果は登録時に一度だけ生成する。"""
+    name: str
+    func: Callable[..., Any]
+    description: str
+    parameters: Dict[str, Any]
+    schema: Dict[str, Any]
+    serialized: str
+    tokens: int
+    skip_when: Optional[Callable[[Mapping[str, Any]], bool]] = None
+
+
+@dataclass(frozen=True)
+class ToolSelection:
+    """1 回の LLM 呼び出しで送るツールの選択結果。"""
+    names: Tuple[str, ...]
+    schemas: List[Dict[str, Any]]
+    tokens: int
+    saved_tokens: int
+
+
+class ToolRegistry:
+    """
+    関数シグネチャと docstring からツールスキーマを生成して保持するレジストリ。
+
+    - スキーマは登録時に一度だけ生成・シリアライズしてキャッシュ
+    - `select` で会話の文脈（判明したサインなど）から不要なツールを除外し、
+      削減できたプロンプトトークン数を記録する
+    """
+
+    def __init__(self):
+        self._tools: Dict[str, RegisteredTool] = {}
+        self._selections: Dict[FrozenSet[str], ToolSelection] = {}
+        self.saved_tokens = 0
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
+
+    def __iter__(self):
+        return iter(self._tools.values())
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        return tuple(self._tools)
+
+    def get(self, name: str) -> RegisteredTool:
+        try:
+            return self._tools[name]
+        except KeyError:
+            raise ValueError(f"Function {name} not found in tool registry") from None
+
+    # -----------------------------
+    #  登録
+    # -----------------------------
+    def tool(
+        self,
+        func: Optional[Callable[..., Any]] = None,
+        *,
+        skip_when: Optional[Callable[[Mapping[str, Any]], bool]] = None,
+    ):
+        """
+        関数をツールとして登録するデコレータ。関数自体はそのまま返す。
+
+        Args:
+            skip_when: 会話の文脈を受け取り、True を返したターンではツールを送らない。
+        """
+        def register(f: Callable[..., Any]) -> Callable[..., Any]:
+            self._register(f, skip_when)
+            return f
+
+        if func is not None:
+            return register(func)
+        return register
+
+    def _register(self, func: Callable[..., Any], skip_when) -> None:
+        description, arg_docs = _parse_docstring(func.__doc__)
+        properties: Dict[str, Any] = {}
+        required: List[str] = []
+        for param in inspect.signature(func).parameters.values():
+            prop: Dict[str, Any] = {"type": _JSON_TYPES.get(param.annotation, "string")}
+            if param.name in arg_docs:
+                prop["description"] = arg_docs[param.name]
+            properties[param.name] = prop
+            if param.default is inspect.Parameter.empty:
+                required.append(param.name)
+        parameters = {"type": "object", "properties": properties, "required": required}
+        schema = {
+            "type": "function",
+            "function": {
+                "name": func.__name__,
+                "description": description,
+                "parameters": parameters,
+            },
+        }
+        serialized = json.dumps(schema, ensure_ascii=False)
+        self._tools[func.__name__] = RegisteredTool(
+            name=func.__name__,
+            func=func,
+            description=description,
+            parameters=parameters,
+            schema=schema,
+            serialized=serialized,
+            tokens=estimate_tokens(serialized),
+            skip_when=skip_when,
+        )
+        self._selections.clear()
+
+    # -----------------------------
+    #  ターンごとの選択
+    # -----------------------------
+    def schemas(self, names: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """指定したツール（省略時はすべて）のスキーマを返す。"""
+        return self._selection(frozenset(self._tools if names is None else names)).schemas
+
+    def select(self, context: Optional[Mapping[str, Any]] = None, record: bool = True) -> ToolSelection:
+        """
+        文脈上使われないツールを除外した選択結果を返す。
+        record が True なら 1 回の LLM 呼び出しに使うものとして削減トークン数を累積する。
+        1 つの選択を複数回の呼び出しで使い回す場合は record=False とし、後で `record` を呼ぶ。
+        """
+        context = context or {}
+        names = frozenset(
+            t.name for t in self._tools.values()
+            if t.skip_when is None or not t.skip_when(context)
+        )
+        selection = self._selection(names)
+        if record:
+            self.record(selection)
+        return selection
+
+    def record(self, selection: ToolSelection, requests: int = 1) -> int:
+        """選択結果を requests 回の LLM 呼び出しで送った分の削減トークン数を累積し、その値を返す。"""
+        saved = selection.saved_tokens * requests
+        self.saved_tokens += saved
+        return saved
+
+    def _selection(self, names: FrozenSet[str]) -> ToolSelection:
+        selection = self._selections.get(names)
+        if selection is None:
+            tools = [t for t in self._tools.values() if t.name in names]
+            tokens = sum(t.tokens for t in tools)
+            selection = ToolSelection(
+                names=tuple(t.name for t in tools),
+                schemas=[t.schema for t in tools],
+                tokens=tokens,
+                saved_tokens=sum(t.tokens for t in self._tools.values()) - tokens,
+            )
+            self._selections[names] = selection
+        return selection
@@ -0,0 +1,127 @@
+import time
+import tracemalloc
+from datetime import date
+
+from horoscope_common.answer_cache import AnswerCache, find_birthdays, find_signs, is_cacheable, normalize_text
+
+DAY = date(2026, 1, 1)
+LONG_QUESTION = "今日の水瓶座の運勢と、ラッキーアイテムと、恋愛運と仕事運と金運をまとめて詳しく知りたいです。よろしく"
+
+
+def scope(text, sign=None):
+    signs = find_signs(text) or ((sign,) if sign else ())
+    return AnswerCache.make_scope(text, signs=signs, day=DAY)
+
+
+def test_normalize_text():
+    assert normalize_text("ＡＢＣ、今日の運勢を教えて！ ") == "abc今日の運勢"
+
+
+def test_find_signs_and_birthdays():
+    assert find_signs("私は魚座で、友達は水瓶座と魚座です") == ("魚座", "水瓶座")
+    assert find_birthdays("誕生日は１９９０-01-25、妹は1995年3月2日") == ("1990-01-25", "1995年3月2日")
+
+
+def test_find_birthdays_accepts_slash_and_dot_separators():
+    assert find_birthdays("友達の誕生日は1990/01/25です") == ("1990/01/25",)
+    assert find_birthdays("1990.1.25生まれ") == ("1990.1.25",)
+    assert find_birthdays("誕生日は１９９０／１／２５") == ("1990/1/25",)
+    assert find_birthdays("誕生日は1/25です") == ("1/25",)
+    assert find_birthdays("今日の運勢は？") == ()
+
+
+def test_similar_question_hits():
+    cache = AnswerCache()
+    cache.put("水瓶座の今日の運勢", scope("水瓶座の今日の運勢"), "answer")
+    question = "今日の水瓶座の運勢を教えて！"
+    assert cache.get(question, scope(question)) == "answer"
+
+
+def test_different_question_misses():
+    cache = AnswerCache()
+    cache.put("水瓶座の今日の運勢", scope("水瓶座の今日の運勢"), "answer")
+    assert cache.get("水瓶座の明日の運勢", scope("水瓶座の明日の運勢")) is None
+    assert cache.get("水瓶座のラッキーアイテム", scope("水瓶座のラッキーアイテム")) is None
+
+
+def test_scope_separates_signs_and_days():
+    cache = AnswerCache()
+    cache.put("今日の運勢はどうですか", scope("今日の運勢はどうですか", sign="水瓶座"), "aquarius")
+    assert cache.get("今日の運勢はどうですか", scope("今日の運勢はどうですか")) is None
+    assert cache.get("今日の運勢はどうですか", scope("今日の運勢はどうですか", sign="魚座")) is None
+    other_day = AnswerCache.make_scope("今日の運勢はどうですか", signs=("水瓶座",), day=date(2026, 1, 2))
+    assert cache.get("今日の運勢はどうですか", other_day) is None
+    assert cache.get("今日の運勢はどうですか", scope("今日の運勢はどうですか", sign="水瓶座")) == "aquarius"
+
+
+def test_followups_are_not_cached():
+    assert not is_cacheable("はい。")
+    assert not is_cacheable("じゃあ彼女の運勢は？")
+    cache = AnswerCache()
+    cache.put("はい", scope("はい"), "lucky item answer")
+    assert cache.get("はい。", scope("はい。")) is None
+    assert len(cache) == 0
+
+
+def test_lru_eviction():
+    cache = AnswerCache(max_entries=2)
+    questions = ["水瓶座の今日の運勢", "牡牛座のラッキーアイテム", "1990-01-25生まれの星座"]
+    for i, question in enumerate(questions):
+        cache.put(question, scope(question), str(i))
+    assert len(cache) == 2
+    assert cache.get(questions[0], scope(questions[0])) is None
+    assert cache.get(questions[2], scope(questions[2])) == "2"
+
+
+def test_eviction_releases_buckets_and_scopes():
+    cache = AnswerCache(max_entries=1, max_bucket=2)
+    s = scope("水瓶座の今日の運勢")
+    for i in range(50):
+        cache.put(f"{i}番目の水瓶座の今日の運勢", s, str(i))
+    assert len(cache) == 1
+    assert len(cache._scopes) == 1
+    assert all(isinstance(bucket, int) for bucket in cache._buckets[s].values())
+
+    cache.put("牡牛座のラッキーアイテム", scope("牡牛座のラッキーアイテム"), "x")
+    assert s not in cache._buckets
+    assert s not in cache._scopes
+
+
+def test_memory_per_entry():
+    cache = AnswerCache()
+    s = scope(LONG_QUESTION)
+    questions = [f"{i}番目の質問、今日の運勢について{i * 7919 % 100003}" for i in range(2_000)]
+    for question in questions[:100]:
+        cache.put(question, s, "answer")
+    cache.clear()
+    tracemalloc.start()
+    try:
+        for question in questions:
+            cache.put(question, s, "answer")
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert current / len(questions) < 1500
+
+
+def _median_ms(func, n=200):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def test_lookup_is_sub_millisecond():
+    cache = AnswerCache()
+    s = scope(LONG_QUESTION)
+    # 定型的な質問が大量に同じバケットへ集まる最悪に近いケース
+    for i in range(30_000):
+        cache.put(f"{i}番目の質問です、今日の運勢について{i * 7919 % 100003}", s, str(i))
+    cache.put(LONG_QUESTION, s, "answer")
+    assert _median_ms(lambda: cache.get(LONG_QUESTION, s)) < 1.0
+    assert _median_ms(lambda: cache.get("12345番目の質問です、今日の運勢について678", s)) < 1.0
+    # n-gram のハッシュがキャッシュされていない初回の検索も 1 ms 未満
+    assert _median_ms(lambda: AnswerCache().get(LONG_QUESTION, s)) < 1.0
@@ -0,0 +1,77 @@
+from horoscope_common.answer_cache import AnswerCache
+from horoscope_common.conversation import ConversationState, find_self_sign
+
+QUESTION = "私の今日の運勢はどうですか"
+
+
+def test_find_self_sign():
+    assert find_self_sign("私は水瓶座です。") == "水瓶座"
+    assert find_self_sign("僕の星座は魚座だよ") == "魚座"
+    assert find_self_sign("友達は魚座です") is None
+    assert find_self_sign("魚座の運勢は？") is None
+
+
+def test_mentioned_sign_does_not_become_own_sign():
+    cache = AnswerCache()
+
+    # ユーザー B（魚座）の回答を登録
+    b = ConversationState()
+    b.start_turn("私は魚座です")
+    b.start_turn(QUESTION)
+    b.store_answer(cache, "魚座の回答")
+
+    # ユーザー A は水瓶座で、友達の魚座に言及したあとに自分の運勢を聞く
+    a = ConversationState()
+    a.start_turn("私は水瓶座です")
+    a.start_turn("友達は魚座です")
+    a.observe_tool_result("get_horoscope", "魚座: 友達の運勢")
+    assert a.own_sign == "水瓶座"
+    a.start_turn(QUESTION)
+    assert a.lookup_answer(cache) is None
+
+    a.store_answer(cache, "水瓶座の回答")
+    b.start_turn("私の今日の運勢はどうですか？")
+    assert b.lookup_answer(cache) == "魚座の回答"
+
+
+def test_unknown_own_sign_skips_cache():
+    cache = AnswerCache()
+    state = ConversationState()
+    state.start_turn(QUESTION)
+    assert state.cache_scope() is None
+    state.store_answer(cache, "answer")
+    assert len(cache) == 0
+
+
+def test_zodiac_result_for_third_party_is_not_own_sign():
+    state = ConversationState(own_sign="水瓶座")
+    state.start_turn("友達の誕生日は1990-03-10です")
+    state.observe_tool_result("get_zodiac_sign", "魚座")
+    assert state.own_sign == "水瓶座"
+
+    state.start_turn("私の誕生日は1990-03-10です")
+    state.observe_tool_result("get_zodiac_sign", "魚座")
+    assert state.own_sign == "魚座"
+
+
+def test_sign_learned_mid_turn_is_not_stored():
+    cache = AnswerCache()
+    state = ConversationState()
+    state.start_turn("私の誕生日は1990-01-25です、今日の運勢は")
+    state.observe_tool_result("get_zodiac_sign", "水瓶座")
+    state.store_answer(cache, "水瓶座の回答")
+    assert len(cache) == 0
+
+
+def test_restore_from_session_items():
+    items = [
+        {"role": "user", "content": "誕生日は1990-01-25です"},
+        {"type": "function_call", "call_id": "c1", "name": "get_zodiac_sign", "arguments": "{}"},
+        {"type": "function_call_output", "call_id": "c1", "output": "水瓶座"},
+        {"role": "user", "content": [{"type": "input_text", "text": "友達は1990-03-10生まれ"}]},
+        {"type": "function_call", "call_id": "c2", "name": "get_zodiac_sign", "arguments": "{}"},
+        {"type": "function_call_output", "call_id": "c2", "output": "魚座"},
+    ]
+    state = ConversationState()
+    state.restore(items)
+    assert state.own_sign == "水瓶座"
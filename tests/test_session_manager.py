@@ -0,0 +1,62 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("agents")
+
+from horoscope_by_openai_agents_sdk.session import SessionManager
+
+
+def item(i):
+    return {"role": "user", "content": f"message {i}"}
+
+
+def test_same_id_shares_instance(tmp_path):
+    manager = SessionManager(base_dir=str(tmp_path))
+    assert manager.get("a") is manager.get("a")
+    assert manager.get("a") is not manager.get("b")
+
+
+def test_eviction_reloads_from_disk(tmp_path):
+    manager = SessionManager(max_items=3, base_dir=str(tmp_path))
+    a, b = manager.get("a"), manager.get("b")
+
+    async def run():
+        await a.add_items([item(0), item(1)])
+        await b.add_items([item(2), item(3)])
+        assert manager.stats()["evictions"] == 1
+        assert await a.get_items() == [item(0), item(1)]
+        assert await a.get_items() == [item(0), item(1)]
+
+    asyncio.run(run())
+    stats = manager.stats()
+    assert stats["items"] <= 3
+    assert stats["misses"] == 3
+    assert stats["hits"] == 1
+    assert stats["hit_rate"] == 0.25
+
+
+def test_concurrent_eviction_keeps_files_intact(tmp_path):
+    manager = SessionManager(max_items=3, base_dir=str(tmp_path))
+    rounds = 30
+
+    def worker(session_id):
+        session = manager.get(session_id)
+
+        async def run():
+            for i in range(rounds):
+                await session.add_items([item(i), item(i)])
+                await session.pop_item()
+
+        asyncio.run(run())
+
+    threads = [threading.Thread(target=worker, args=(f"s{i % 3}",)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    for i in range(3):
+        lines = (tmp_path / f"s{i}.jsonl").read_text(encoding="utf-8").splitlines()
+        assert len(lines) == 2 * rounds
@@ -0,0 +1,88 @@
+from horoscope_common.tool_registry import ToolRegistry
+
+
+def make_registry():
+    registry = ToolRegistry()
+
+    @registry.tool
+    def get_horoscope(sign: str) -> str:
+        """
+        占星術のサインの今日の運勢を取得します。
+
+        Args:
+            sign (str): 牡牛座や水瓶座などの占星術のサイン
+        Returns:
+            str: 今日の運勢
+        """
+        return sign
+
+    @registry.tool(skip_when=lambda ctx: bool(ctx.get("sign")) and not ctx.get("birthdays"))
+    def get_zodiac_sign(birthday: str, strict: bool = False) -> str:
+        """誕生日から星座を判定します。"""
+        return birthday
+
+    return registry
+
+
+def test_schema_from_signature_and_docstring():
+    schema = make_registry().schemas(["get_horoscope"])[0]
+    assert schema == {
+        "type": "function",
+        "function": {
+            "name": "get_horoscope",
+            "description": "占星術のサインの今日の運勢を取得します。",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "sign": {"type": "string", "description": "牡牛座や水瓶座などの占星術のサイン"},
+                },
+                "required": ["sign"],
+            },
+        },
+    }
+
+
+def test_optional_parameters_are_not_required():
+    params = make_registry().get("get_zodiac_sign").parameters
+    assert params["properties"]["strict"] == {"type": "boolean"}
+    assert params["required"] == ["birthday"]
+
+
+def test_select_prunes_and_reports_saved_tokens():
+    registry = make_registry()
+    full = registry.select({})
+    assert full.names == ("get_horoscope", "get_zodiac_sign")
+    assert full.saved_tokens == 0
+
+    pruned = registry.select({"sign": "水瓶座"})
+    assert pruned.names == ("get_horoscope",)
+    assert pruned.saved_tokens == registry.get("get_zodiac_sign").tokens > 0
+    assert registry.saved_tokens == pruned.saved_tokens
+
+    # 誕生日が含まれるターンでは星座判定ツールを残す
+    assert registry.select({"sign": "水瓶座", "birthdays": ("2000-01-01",)}).names == full.names
+
+
+def test_selection_is_cached():
+    registry = make_registry()
+    assert registry.select({"sign": "水瓶座"}).schemas is registry.select({"sign": "魚座"}).schemas
+
+
+def test_zodiac_tool_kept_when_birthday_given():
+    from horoscope_by_agent.tools import registry
+    from horoscope_common.conversation import ConversationState
+
+    state = ConversationState(own_sign="水瓶座")
+    state.start_turn("今日の運勢はどうですか")
+    assert "get_zodiac_sign" not in registry.select(state.tool_context()).names
+    for text in ("友達の誕生日は1990/01/25です", "1990.1.25生まれの友達の星座は？"):
+        state.start_turn(text)
+        assert "get_zodiac_sign" in registry.select(state.tool_context()).names
+
+
+def test_record_counts_each_model_call():
+    registry = make_registry()
+    selection = registry.select({"sign": "水瓶座"}, record=False)
+    assert registry.saved_tokens == 0
+    assert registry.record(selection, 2) == 2 * selection.saved_tokens
+    assert registry.saved_tokens == 2 * selection.saved_tokens